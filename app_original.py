@@ -10,11 +10,22 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
-import requests
+import orjson
+import json
 import logging
+import hashlib
+import os
+import threading
+from pathlib import Path
 from functools import lru_cache
+import cachetools
 import geopandas as gpd
+import shapely
 from geobr import read_municipality
+from fetch_data import SESSION, MOSQLIMATE_API, INFODENGUE_API
+from fetch_data import (
+    NIVEL_NAMES, NIVEL_COLORS, get_alert_level_name, get_alert_level_color, level_indices
+)
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -74,9 +85,6 @@ st.markdown("""
 # CONSTANTES E CONFIGURAÇÕES
 # ============================================================================
 
-MOSQLIMATE_API = "https://api.mosqlimate.org/api/datastore/infodengue"
-INFODENGUE_API = "https://info.dengue.mat.br/api/alertcity"
-
 # Mapeamento de códigos IBGE para municípios de Goiás (amostra)
 GOIAS_MUNICIPALITIES = {
     "3301500": "Goiânia",
@@ -94,11 +102,40 @@ GOIAS_MUNICIPALITIES = {
     "3307500": "Trindade",
 }
 
+# Índices derivados, calculados uma vez na importação
+GOIAS_NAME_TO_CODE = {v: k for k, v in GOIAS_MUNICIPALITIES.items()}
+GOIAS_NAMES_SORTED = sorted(GOIAS_NAME_TO_CODE)
+
+# Rótulos das métricas disponíveis no mapa
+MAP_METRIC_LABELS = {
+    "p_inc100k": "Taxa de Incidência",
+    "nivel": "Nível de Alerta",
+    "Rt": "Número Reprodutivo"
+}
+
+# Nomes e cores dos níveis de alerta, indexados pelo nível (0 = desconhecido)
+_LEVEL_NAMES = np.array(NIVEL_NAMES)
+_LEVEL_COLORS = np.array(NIVEL_COLORS)
+
+# Colunas da API usadas pelo dashboard (demais campos são descartados)
+KEEP_COLS = [
+    'data_iniSE', 'data_ini_SE', 'SE', 'municipio_geocodigo', 'geocode', 'municipio_nome',
+    'casos_est', 'casos', 'p_inc100k', 'Rt', 'nivel', 'pop',
+    'receptivo', 'transmissao', 'tempmed', 'umidmed'
+]
+
+# Simplificação das geometrias (graus, SIRGAS 2000)
+GEO_SIMPLIFY_TOLERANCE = 0.005
+GEO_GRID_SIZE = 1e-5
+
+# Cache local das geometrias já simplificadas (sobrevive a reinícios)
+GEO_CACHE_PATH = Path("cache/go_muni.parquet")
+
 # ============================================================================
 # FUNÇÕES DE CACHE E BUSCA DE DADOS
 # ============================================================================
 
-@st.cache_data(ttl=3600)
+@cachetools.cached(cache=cachetools.TTLCache(maxsize=128, ttl=3600), lock=threading.Lock())
 def fetch_infodengue_state_data(state_code: str = "GO", disease: str = "dengue"):
     """
     Busca dados epidemiológicos do estado via API InfoDengue.
@@ -131,10 +168,10 @@ def fetch_infodengue_state_data(state_code: str = "GO", disease: str = "dengue")
                     "ey_end": current_year
                 }
                 
-                response = requests.get(INFODENGUE_API, params=params, timeout=10)
+                response = SESSION.get(INFODENGUE_API, params=params, timeout=10)
                 response.raise_for_status()
                 
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 if isinstance(data, list):
                     all_data.extend(data)
@@ -149,7 +186,7 @@ def fetch_infodengue_state_data(state_code: str = "GO", disease: str = "dengue")
             logger.warning("Nenhum dado obtido da API")
             return pd.DataFrame()
         
-        df = pd.DataFrame(all_data)
+        df = pd.DataFrame.from_records(all_data)
         
         # Processar dados
         if not df.empty:
@@ -165,7 +202,7 @@ def fetch_infodengue_state_data(state_code: str = "GO", disease: str = "dengue")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=3600)
+@cachetools.cached(cache=cachetools.TTLCache(maxsize=128, ttl=3600), lock=threading.Lock())
 def fetch_municipality_data(geocode: str, disease: str = "dengue"):
     """
     Busca dados de um município específico.
@@ -191,15 +228,15 @@ def fetch_municipality_data(geocode: str, disease: str = "dengue"):
             "ey_end": current_year
         }
         
-        response = requests.get(INFODENGUE_API, params=params, timeout=30)
+        response = SESSION.get(INFODENGUE_API, params=params, timeout=30)
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         
         if isinstance(data, list):
-            df = pd.DataFrame(data)
+            df = pd.DataFrame.from_records(data)
         else:
-            df = pd.DataFrame([data])
+            df = pd.DataFrame.from_records([data])
         
         if not df.empty:
             df = process_dengue_data(df)
@@ -216,18 +253,47 @@ def get_goias_geodata():
     """
     Carrega dados geográficos de Goiás usando geobr.
     
+    As geometrias são simplificadas (preservando a topologia) e as
+    coordenadas arredondadas para 5 casas decimais, reduzindo o GeoJSON
+    enviado ao navegador sem diferença visível no zoom do dashboard.
+    
+    O resultado é persistido em GeoParquet (GEO_CACHE_PATH), de modo que
+    apenas a primeira inicialização depende do download via geobr.
+    
     Returns:
         GeoDataFrame com municípios de Goiás
     """
     
     try:
+        if GEO_CACHE_PATH.exists():
+            logger.info(f"Carregando dados geográficos de {GEO_CACHE_PATH}")
+            return gpd.read_parquet(GEO_CACHE_PATH).astype({'code_muni': 'int64'})
+        
         logger.info("Carregando dados geográficos de Goiás")
         
         # Ler municípios do Brasil com parâmetro correto
         gdf = read_municipality(code_muni="GO", simplified=True)
+        gdf['code_muni'] = gdf['code_muni'].astype('int64')
+        
+        # Reduzir vértices e precisão das coordenadas
+        simplified = gdf.geometry.simplify(GEO_SIMPLIFY_TOLERANCE, preserve_topology=True)
+        gdf[gdf.geometry.name] = gpd.GeoSeries(
+            shapely.set_precision(simplified.values, grid_size=GEO_GRID_SIZE),
+            index=gdf.index,
+            crs=gdf.crs
+        )
         
         logger.info(f"Dados geográficos carregados: {len(gdf)} municípios")
         
+        # Escrita atômica: outro processo nunca lê um arquivo incompleto
+        try:
+            GEO_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = GEO_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+            gdf.to_parquet(tmp_path, compression="zstd")
+            os.replace(tmp_path, GEO_CACHE_PATH)
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar cache geográfico: {e}")
+        
         return gdf
     
     except Exception as e:
@@ -250,25 +316,38 @@ def process_dengue_data(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
     
-    # Converter tipos de dados numéricos
+    # Descartar colunas não exibidas antes de qualquer conversão
+    df = df.drop(columns=df.columns.difference(KEEP_COLS))
+    
+    # Converter tipos de dados numéricos (apenas colunas mantidas em KEEP_COLS)
     numeric_cols = [
-        'casos_est', 'casos_est_min', 'casos_est_max', 'casos',
-        'p_rt1', 'p_inc100k', 'Rt', 'pop', 'receptivo', 'transmissao',
-        'umidmax', 'umidmed', 'umidmin', 'tempmax', 'tempmed', 'tempmin',
-        'casprov', 'casprov_est', 'casprov_est_min', 'casprov_est_max', 'casconf'
+        'casos_est', 'casos', 'p_inc100k', 'Rt', 'pop',
+        'receptivo', 'transmissao', 'umidmed', 'tempmed'
     ]
     
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    present = [col for col in numeric_cols if col in df.columns]
+    df[present] = df[present].apply(pd.to_numeric, errors='coerce', downcast='float')
     
     # Converter datas
-    for date_col in ['data_iniSE', 'data_ini_SE']:
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    date_cols = [col for col in ['data_iniSE', 'data_ini_SE'] if col in df.columns]
+    df[date_cols] = df[date_cols].apply(pd.to_datetime, errors='coerce')
     
-    # Preencher NaN com 0
-    df = df.fillna(0)
+    # Preencher NaN com 0 apenas nas colunas numéricas (datas mantêm NaT)
+    df[present] = df[present].fillna(0)
+    
+    # Geocódigos como inteiros (mesmo tipo de code_muni no GeoDataFrame)
+    for col in ['municipio_geocodigo', 'geocode']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    
+    # Contagens e população cabem em inteiros pequenos
+    for col in ['casos', 'pop']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce', downcast='integer')
+    
+    # Nível ausente vira 0 (desconhecido) antes do cast para inteiro
+    if 'nivel' in df.columns:
+        df['nivel'] = pd.to_numeric(df['nivel'], errors='coerce').fillna(0).astype('int8')
     
     # Ordenar por data se disponível
     if 'data_iniSE' in df.columns:
@@ -279,6 +358,43 @@ def process_dengue_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def compute_latest(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Seleciona o registro mais recente de cada município.
+    
+    Usa groupby + idxmax (O(N)) em vez de ordenar o DataFrame inteiro;
+    deve ser calculado uma vez por execução e reutilizado pelas visualizações.
+    
+    Args:
+        df: DataFrame com a série histórica de todos os municípios
+    
+    Returns:
+        DataFrame com uma linha por município
+    """
+    
+    if df.empty:
+        return df
+    
+    # Identificar coluna de data (pode ser 'data_iniSE' ou 'data_ini_SE')
+    date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
+    
+    # Identificar coluna de geocódigo
+    geocode_col = None
+    for col in ['municipio_geocodigo', 'geocode', 'code_muni']:
+        if col in df.columns:
+            geocode_col = col
+            break
+    
+    # Se não houver coluna de geocódigo, usar os registros mais recentes
+    if geocode_col is None:
+        return df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'] if 'municipio_nome' in df.columns else None)))
+    
+    df = df.dropna(subset=[date_col]).reset_index(drop=True)
+    
+    return df.loc[df.groupby(geocode_col)[date_col].idxmax()]
+
+
+@lru_cache(maxsize=8)
 def get_alert_level_info(level: int) -> tuple:
     """
     Retorna nome e cor para o nível de alerta.
@@ -290,14 +406,7 @@ def get_alert_level_info(level: int) -> tuple:
         Tupla (nome, cor)
     """
     
-    levels = {
-        1: ("Verde", "#2ecc71"),
-        2: ("Amarelo", "#f39c12"),
-        3: ("Laranja", "#e67e22"),
-        4: ("Vermelho", "#e74c3c")
-    }
-    
-    return levels.get(int(level), ("Desconhecido", "#95a5a6"))
+    return get_alert_level_name(level), get_alert_level_color(level)
 
 
 # ============================================================================
@@ -334,7 +443,8 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
     if not agg_dict:
         return None
     
-    df_agg = df.groupby(date_col).agg(agg_dict).reset_index()
+    # process_dengue_data já ordena por data: agrupar sem reordenar os grupos
+    df_agg = df.groupby(date_col, sort=False)[list(agg_dict)].sum().reset_index()
     
     # Preparar colunas para o gráfico
     y_cols = [col for col in ['casos_est', 'casos'] if col in df_agg.columns]
@@ -342,20 +452,25 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
     if not y_cols:
         return None
     
-    fig = px.line(
-        df_agg,
-        x=date_col,
-        y=y_cols,
-        title=title,
-        labels={
-            'data_iniSE': 'Data',
-            'casos_est': 'Casos Estimados (Nowcasting)',
-            'casos': 'Casos Notificados'
-        },
-        markers=True
-    )
+    labels = {
+        'casos_est': 'Casos Estimados (Nowcasting)',
+        'casos': 'Casos Notificados'
+    }
+    
+    # Traços WebGL: renderizados na GPU, escalam para séries longas
+    fig = go.Figure()
+    for col in y_cols:
+        fig.add_trace(go.Scattergl(
+            x=df_agg[date_col],
+            y=df_agg[col],
+            mode='lines+markers',
+            name=labels[col]
+        ))
     
     fig.update_layout(
+        title=title,
+        xaxis_title='Data',
+        yaxis_title='Casos',
         hovermode='x unified',
         height=400,
         template='plotly_white'
@@ -364,30 +479,79 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
     return fig
 
 
-def create_choropleth_map(gdf: gpd.GeoDataFrame, df: pd.DataFrame, metric: str = "p_inc100k"):
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """
+    Calcula um hash barato do conteúdo de um DataFrame.
+    
+    Args:
+        df: DataFrame a ser identificado
+    
+    Returns:
+        Hash MD5 hexadecimal
+    """
+    
+    return hashlib.md5(pd.util.hash_pandas_object(df).values.tobytes()).hexdigest()
+
+
+@st.cache_resource
+def build_geojson(_gdf: gpd.GeoDataFrame) -> dict:
+    """
+    Serializa as geometrias de Goiás para GeoJSON uma única vez por processo.
+    
+    Cada feature carrega apenas o geocódigo em properties.code_muni, usado
+    como featureidkey no mapa.
+    
+    Args:
+        _gdf: GeoDataFrame com geometrias (não entra na chave do cache)
+    
+    Returns:
+        FeatureCollection dos municípios
+    """
+    
+    return json.loads(_gdf[['code_muni', _gdf.geometry.name]].to_json())
+
+
+@st.cache_data(ttl=3600, max_entries=32)
+def build_choropleth(data_hash: str, metric: str, _gdf: gpd.GeoDataFrame, _df_latest: pd.DataFrame):
+    """
+    Monta o mapa coroplético e o memoiza por (hash dos dados, métrica).
+    
+    Args:
+        data_hash: Hash do conteúdo de _df_latest (chave do cache)
+        metric: Métrica a visualizar
+        _gdf: GeoDataFrame com geometrias
+        _df_latest: DataFrame com o registro mais recente de cada município
+    
+    Returns:
+        Dicionário da figura Plotly ou None
+    """
+    
+    fig = create_choropleth_map(_gdf, _df_latest, metric=metric)
+    
+    return fig.to_dict() if fig else None
+
+
+def create_choropleth_map(gdf: gpd.GeoDataFrame, df_latest: pd.DataFrame, metric: str = "p_inc100k"):
     """
     Cria mapa coroplético com dados de dengue.
     
     Args:
         gdf: GeoDataFrame com geometrias
-        df: DataFrame com dados epidemiológicos
+        df_latest: DataFrame com o registro mais recente de cada município
         metric: Métrica a visualizar (p_inc100k, nivel, Rt)
     
     Returns:
         Figura Plotly
     """
     
-    if gdf is None or df.empty:
+    if gdf is None or df_latest.empty:
         return None
     
     try:
-        # Identificar coluna de data
-        date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
-        
         # Identificar coluna de geocódigo
         geocode_col = None
         for col in ['municipio_geocodigo', 'geocode', 'code_muni']:
-            if col in df.columns:
+            if col in df_latest.columns:
                 geocode_col = col
                 break
         
@@ -395,45 +559,33 @@ def create_choropleth_map(gdf: gpd.GeoDataFrame, df: pd.DataFrame, metric: str =
             logger.warning("Nenhuma coluna de geocódigo encontrada")
             return None
         
-        # Preparar dados para o mapa
-        df_latest = df.sort_values(date_col).groupby(geocode_col).tail(1).reset_index(drop=True)
+        # Apenas as linhas com geocódigo; as geometrias vêm do GeoJSON cacheado
+        df_map = df_latest.dropna(subset=[geocode_col]).astype({geocode_col: 'int64'})
         
-        if df_latest.empty:
-            logger.warning("Nenhum dado disponível após agrupamento")
-            return None
-        
-        # Merge com dados geográficos
-        gdf_merged = gdf.merge(
-            df_latest,
-            left_on='code_muni',
-            right_on=geocode_col,
-            how='left'
-        )
-        
-        if gdf_merged.empty:
-            logger.warning("Merge resultou em DataFrame vazio")
+        if df_map.empty:
+            logger.warning("Nenhum município com geocódigo válido")
             return None
         
         # Identificar coluna de métrica
         color_col = metric
-        if color_col not in gdf_merged.columns:
+        if color_col not in df_map.columns:
             # Tentar alternativas
             for alt_metric in ['casos_est', 'casos', 'p_inc100k']:
-                if alt_metric in gdf_merged.columns:
+                if alt_metric in df_map.columns:
                     color_col = alt_metric
                     break
         
         # Verificar se a métrica existe
-        if color_col not in gdf_merged.columns:
+        if color_col not in df_map.columns:
             logger.warning(f"Métrica {metric} não encontrada. Usando primeira coluna numérica.")
-            numeric_cols = gdf_merged.select_dtypes(include=[np.number]).columns.tolist()
+            numeric_cols = df_map.select_dtypes(include=[np.number]).columns.tolist()
             if numeric_cols:
                 color_col = numeric_cols[0]
             else:
                 return None
         
         # Preencher NaN com 0 para a métrica
-        gdf_merged[color_col] = gdf_merged[color_col].fillna(0)
+        df_map[color_col] = df_map[color_col].fillna(0)
         
         # Definir título baseado na métrica
         metric_titles = {
@@ -456,7 +608,7 @@ def create_choropleth_map(gdf: gpd.GeoDataFrame, df: pd.DataFrame, metric: str =
         # Preparar hover_data dinamicamente
         hover_data = {}
         for col in ['municipio_nome', 'name', 'pop', 'casos_est', 'casos', 'Rt', 'p_inc100k', 'nivel']:
-            if col in gdf_merged.columns:
+            if col in df_map.columns:
                 if col in ['pop', 'casos_est', 'casos']:
                     hover_data[col] = ':.0f'
                 elif col in ['Rt', 'p_inc100k']:
@@ -464,23 +616,21 @@ def create_choropleth_map(gdf: gpd.GeoDataFrame, df: pd.DataFrame, metric: str =
                 else:
                     hover_data[col] = True
         
-        hover_data['geometry'] = False
-        hover_data['code_muni'] = False
-        if geocode_col in hover_data:
-            hover_data[geocode_col] = False
+        hover_data[geocode_col] = False
         
         # Determinar hover_name
         hover_name = None
         for col in ['name', 'municipio_nome']:
-            if col in gdf_merged.columns:
+            if col in df_map.columns:
                 hover_name = col
                 break
         
         # Criar mapa
         fig = px.choropleth_mapbox(
-            gdf_merged,
-            geojson=gdf_merged.geometry,
-            locations=gdf_merged.index,
+            df_map,
+            geojson=build_geojson(gdf),
+            featureidkey="properties.code_muni",
+            locations=geocode_col,
             color=color_col,
             hover_name=hover_name,
             hover_data=hover_data,
@@ -504,47 +654,31 @@ def create_choropleth_map(gdf: gpd.GeoDataFrame, df: pd.DataFrame, metric: str =
         return None
 
 
-def create_alert_level_distribution(df: pd.DataFrame):
+def create_alert_level_distribution(df_latest: pd.DataFrame):
     """
     Cria gráfico de distribuição de níveis de alerta.
     
     Args:
-        df: DataFrame com dados
+        df_latest: DataFrame com o registro mais recente de cada município
     
     Returns:
         Figura Plotly
     """
     
-    if df.empty:
+    if df_latest.empty:
         return None
     
-    # Identificar coluna de nível
-    nivel_col = 'nivel' if 'nivel' in df.columns else 'level'
-    if nivel_col not in df.columns:
+    if 'nivel' not in df_latest.columns:
         return None
     
-    # Identificar coluna de data
-    date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
-    
-    # Identificar coluna de geocódigo
-    geocode_col = None
-    for col in ['municipio_geocodigo', 'geocode', 'code_muni']:
-        if col in df.columns:
-            geocode_col = col
-            break
-    
     # Contar níveis
-    if geocode_col:
-        df_latest = df.sort_values(date_col).groupby(geocode_col).tail(1)
-    else:
-        df_latest = df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'] if 'municipio_nome' in df.columns else None)))
+    nivel_counts = df_latest['nivel'].value_counts().sort_index()
     
-    nivel_counts = df_latest[nivel_col].value_counts().sort_index()
-    nivel_names = {1: "Verde", 2: "Amarelo", 3: "Laranja", 4: "Vermelho"}
-    nivel_colors = {1: "#2ecc71", 2: "#f39c12", 3: "#e67e22", 4: "#e74c3c"}
+    # Indexação direta nos arrays de nomes/cores (níveis fora de 1-4 -> 0)
+    levels = level_indices(nivel_counts.index)
     
-    labels = [nivel_names.get(i, f"Nível {i}") for i in nivel_counts.index]
-    colors = [nivel_colors.get(i, "#95a5a6") for i in nivel_counts.index]
+    labels = _LEVEL_NAMES[levels]
+    colors = _LEVEL_COLORS[levels]
     
     fig = go.Figure(data=[
         go.Bar(
@@ -567,18 +701,51 @@ def create_alert_level_distribution(df: pd.DataFrame):
     return fig
 
 
-def create_metrics_summary(df: pd.DataFrame):
+@st.cache_resource(max_entries=16)
+def build_time_series_chart(data_hash: str, title: str, _df: pd.DataFrame):
+    """
+    Memoiza o gráfico de série temporal por (hash dos dados, título).
+    
+    Args:
+        data_hash: Hash do conteúdo de _df (chave do cache)
+        title: Título do gráfico
+        _df: DataFrame com dados
+    
+    Returns:
+        Figura Plotly
+    """
+    
+    return create_time_series_chart(_df, title=title)
+
+
+@st.cache_resource(max_entries=16)
+def build_alert_level_distribution(data_hash: str, _df_latest: pd.DataFrame):
+    """
+    Memoiza o gráfico de níveis de alerta pelo hash dos dados.
+    
+    Args:
+        data_hash: Hash do conteúdo de _df_latest (chave do cache)
+        _df_latest: DataFrame com o registro mais recente de cada município
+    
+    Returns:
+        Figura Plotly
+    """
+    
+    return create_alert_level_distribution(_df_latest)
+
+
+def create_metrics_summary(df_latest: pd.DataFrame):
     """
     Cria resumo de métricas principais.
     
     Args:
-        df: DataFrame com dados
+        df_latest: DataFrame com o registro mais recente de cada município
     
     Returns:
         Dicionário com métricas
     """
     
-    if df.empty:
+    if df_latest.empty:
         return {
             'total_casos': 0,
             'total_casos_est': 0,
@@ -589,33 +756,17 @@ def create_metrics_summary(df: pd.DataFrame):
             'municipios_alerta_verde': 0,
         }
     
-    # Identificar coluna de data (pode ser 'data_iniSE' ou 'data_ini_SE')
-    date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
-    
-    # Identificar coluna de geocódigo (pode ser 'municipio_geocodigo' ou outra)
-    geocode_col = None
-    for col in ['municipio_geocodigo', 'geocode', 'code_muni']:
-        if col in df.columns:
-            geocode_col = col
-            break
-    
-    # Se não houver coluna de geocódigo, usar índice
-    if geocode_col is None:
-        df_latest = df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'] if 'municipio_nome' in df.columns else None)))
-    else:
-        df_latest = df.sort_values(date_col).groupby(geocode_col).tail(1)
-    
     # Preencher valores padrão para colunas que podem não existir
     casos = df_latest['casos'].sum() if 'casos' in df_latest.columns else 0
     casos_est = df_latest['casos_est'].sum() if 'casos_est' in df_latest.columns else 0
     rt_mean = df_latest['Rt'].mean() if 'Rt' in df_latest.columns else 0
-    nivel_col = 'nivel' if 'nivel' in df_latest.columns else 'level'
+    has_nivel = 'nivel' in df_latest.columns
     
     nivel_counts = {
-        4: int((df_latest[nivel_col] == 4).sum()) if nivel_col in df_latest.columns else 0,
-        3: int((df_latest[nivel_col] == 3).sum()) if nivel_col in df_latest.columns else 0,
-        2: int((df_latest[nivel_col] == 2).sum()) if nivel_col in df_latest.columns else 0,
-        1: int((df_latest[nivel_col] == 1).sum()) if nivel_col in df_latest.columns else 0,
+        4: int((df_latest['nivel'] == 4).sum()) if has_nivel else 0,
+        3: int((df_latest['nivel'] == 3).sum()) if has_nivel else 0,
+        2: int((df_latest['nivel'] == 2).sum()) if has_nivel else 0,
+        1: int((df_latest['nivel'] == 1).sum()) if has_nivel else 0,
     }
     
     return {
@@ -676,7 +827,9 @@ def main():
         st.markdown("## 📊 Visão Geral do Estado")
         
         # Métricas principais
-        metrics = create_metrics_summary(df_state)
+        df_latest = compute_latest(df_state)
+        latest_hash = hash_dataframe(df_latest)
+        metrics = create_metrics_summary(df_latest)
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -714,7 +867,7 @@ def main():
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            fig_alert = create_alert_level_distribution(df_state)
+            fig_alert = build_alert_level_distribution(latest_hash, df_latest)
             if fig_alert:
                 st.plotly_chart(fig_alert, use_container_width=True)
         
@@ -730,7 +883,7 @@ def main():
         # Série temporal
         st.markdown("### Evolução Temporal de Casos")
         
-        fig_ts = create_time_series_chart(df_state)
+        fig_ts = build_time_series_chart(hash_dataframe(df_state), "Evolução de Casos Estimados", df_state)
         if fig_ts:
             st.plotly_chart(fig_ts, use_container_width=True)
         
@@ -739,17 +892,13 @@ def main():
         
         metric_choice = st.selectbox(
             "Selecione a métrica para o mapa:",
-            options=["p_inc100k", "nivel", "Rt"],
-            format_func=lambda x: {
-                "p_inc100k": "Taxa de Incidência",
-                "nivel": "Nível de Alerta",
-                "Rt": "Número Reprodutivo"
-            }[x]
+            options=list(MAP_METRIC_LABELS),
+            format_func=MAP_METRIC_LABELS.__getitem__
         )
         
-        fig_map = create_choropleth_map(gdf, df_state, metric=metric_choice)
+        fig_map = build_choropleth(latest_hash, metric_choice, gdf, df_latest)
         if fig_map:
-            st.plotly_chart(fig_map, use_container_width=True)
+            st.plotly_chart(go.Figure(fig_map), use_container_width=True)
         else:
             st.warning("⚠️ Não foi possível gerar o mapa. Verifique os dados geográficos.")
     
@@ -761,13 +910,12 @@ def main():
         st.markdown("## 🏘️ Análise por Município")
         
         # Seletor de município
-        municipality_options = {v: k for k, v in GOIAS_MUNICIPALITIES.items()}
         selected_municipality = st.selectbox(
             "Selecione um município:",
-            options=list(municipality_options.keys())
+            options=GOIAS_NAMES_SORTED
         )
         
-        geocode = municipality_options[selected_municipality]
+        geocode = GOIAS_NAME_TO_CODE[selected_municipality]
         
         # Buscar dados do município
         df_muni = fetch_municipality_data(geocode, disease=disease)
@@ -799,8 +947,7 @@ def main():
                 )
             
             with col4:
-                nivel = int(latest.get('nivel', 1))
-                nivel_name, nivel_color = get_alert_level_info(nivel)
+                nivel_name, nivel_color = get_alert_level_info(latest.get('nivel', 1))
                 st.markdown(f"""
                 <div style="background-color: {nivel_color}; padding: 20px; border-radius: 10px; text-align: center;">
                     <h3 style="color: white; margin: 0;">Nível: {nivel_name}</h3>
@@ -810,7 +957,11 @@ def main():
             # Série temporal do município
             st.markdown("### Evolução de Casos")
             
-            fig_ts_muni = create_time_series_chart(df_muni, title=f"Evolução de Casos - {selected_municipality}")
+            fig_ts_muni = build_time_series_chart(
+                hash_dataframe(df_muni),
+                f"Evolução de Casos - {selected_municipality}",
+                df_muni
+            )
             if fig_ts_muni:
                 st.plotly_chart(fig_ts_muni, use_container_width=True)
             
@@ -12,10 +12,17 @@ Licença: MIT
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
+import orjson
 import logging
-from datetime import datetime, timedelta
-import plotly.express as px
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from cachetools import TTLCache
+from fetch_data import NIVEL_NAMES as _NIVEL_NAMES, NIVEL_COLORS as _NIVEL_COLORS
+from fetch_data import get_alert_level_name, get_alert_level_color, level_indices
+from fetch_data import GOIAS_STATE_CODE, GOIAS_UF_IBGE, filter_state, process_dengue_data
+from fetch_data import fetch_infodengue_data as fetch_state_data, clear_persisted_data
+from fetch_data import SESSION, INFODENGUE_API, CACHE_TTL
 import plotly.graph_objects as go
 
 # ============================================================================
@@ -33,9 +40,6 @@ st.set_page_config(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# APIs
-INFODENGUE_API = "https://info.dengue.mat.br/api/alertcity"
-
 # Municípios de Goiás (amostra)
 GOIAS_MUNICIPALITIES = {
     5103403: "Goiânia",
@@ -60,14 +64,134 @@ GOIAS_MUNICIPALITIES = {
     5106704: "Campinaçu",
 }
 
+# Nome -> geocódigo e opções ordenadas do seletor de município
+_INV_MUNI = {v: k for k, v in GOIAS_MUNICIPALITIES.items()}
+_MUNI_OPTIONS = sorted(_INV_MUNI)
+
+# Nomes e cores dos níveis de alerta, indexados pelo nível (0 = desconhecido)
+NIVEL_NAMES = np.array(_NIVEL_NAMES)
+NIVEL_COLORS = np.array(_NIVEL_COLORS)
+
+# Rótulos das colunas exibidas nas tabelas
+RENAME_MAP = {
+    'data_iniSE': 'Semana Epidemiológica',
+    'data_ini_SE': 'Semana Epidemiológica',
+    'municipio_nome': 'Município',
+    'casos_est': 'Casos Estimados',
+    'casos': 'Casos Notificados',
+    'p_inc100k': 'Taxa de Incidência',
+    'Rt': 'Rt',
+    'nivel': 'Nível',
+}
+
 # ============================================================================
 # FUNÇÕES DE BUSCA DE DADOS
 # ============================================================================
 
-@st.cache_data(ttl=3600)
+# Respostas recentes da API e requisições idênticas em andamento
+_response_cache = TTLCache(maxsize=256, ttl=3600)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_json(url: str, params: dict, timeout: int = 30):
+    """
+    Executa um GET e retorna o JSON decodificado, deduplicando requisições.
+    
+    Chamadas idênticas (mesma URL e parâmetros) feitas enquanto uma requisição
+    está em andamento aguardam o mesmo Future em vez de repetir o GET, e
+    respostas recentes são servidas de um cache TTL em memória.
+    
+    Args:
+        url: Endpoint da API
+        params: Parâmetros da query string
+        timeout: Tempo limite da requisição em segundos
+    
+    Returns:
+        Conteúdo JSON da resposta
+    """
+    
+    key = (url, tuple(sorted(params.items())))
+    
+    with _inflight_lock:
+        if key in _response_cache:
+            return _response_cache[key]
+        
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[key] = future
+    
+    if not is_owner:
+        return future.result()
+    
+    try:
+        response = SESSION.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+    except Exception as e:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        future.set_exception(e)
+        raise
+    
+    with _inflight_lock:
+        _response_cache[key] = data
+        _inflight.pop(key, None)
+    future.set_result(data)
+    
+    return data
+
+
+def _convert_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas de data conhecidas para datetime."""
+    
+    for col in ['data_iniSE', 'data_ini_SE', 'data']:
+        if col in df.columns:
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except:
+                pass
+    
+    return df
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def _load_infodengue_data(geocode: str, disease: str):
+    """
+    Consulta cacheada de fetch_infodengue_data.
+    
+    Falhas e respostas vazias levantam exceção para não ficarem no cache.
+    """
+    
+    params = {
+        "geocode": geocode,
+        "disease": disease,
+        "format": "json"
+    }
+    
+    data = get_json(INFODENGUE_API, params, timeout=10)
+    
+    if isinstance(data, list):
+        df = pd.DataFrame.from_records(data)
+    elif isinstance(data, dict):
+        df = pd.DataFrame.from_records([data])
+    else:
+        df = pd.DataFrame()
+    
+    if df.empty:
+        raise LookupError("resposta sem registros")
+    
+    return _convert_date_columns(df)
+
+
 def fetch_infodengue_data(geocode: str, disease: str = "dengue"):
     """
-    Busca dados epidemiológicos via API InfoDengue.
+    Busca dados epidemiológicos de um município via API InfoDengue.
+    
+    Usado apenas na análise detalhada por município; a visão estadual
+    usa a consulta agregada de fetch_all_municipalities_data.
     
     Args:
         geocode: Código IBGE do município
@@ -78,64 +202,136 @@ def fetch_infodengue_data(geocode: str, disease: str = "dengue"):
     """
     
     try:
-        params = {
-            "geocode": geocode,
-            "disease": disease,
-            "format": "json"
-        }
-        
-        response = requests.get(INFODENGUE_API, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if isinstance(data, list):
-            df = pd.DataFrame(data)
-        elif isinstance(data, dict):
-            df = pd.DataFrame([data])
-        else:
-            return pd.DataFrame()
-        
-        # Converter colunas de data
-        for col in ['data_iniSE', 'data_ini_SE', 'data']:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_datetime(df[col])
-                except:
-                    pass
-        
-        return df
+        return _load_infodengue_data(geocode, disease)
     
     except Exception as e:
         logger.error(f"Erro ao buscar dados para {geocode}: {e}")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=3600)
-def fetch_all_municipalities_data(disease: str = "dengue"):
+@st.cache_data(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def _load_all_municipalities_data(disease: str, days: int):
+    """
+    Consulta cacheada de fetch_all_municipalities_data.
+    
+    Respostas vazias (inclusive por falha na busca) levantam exceção para
+    não ficarem no cache.
+    """
+    
+    # Sem datas explícitas: fetch_data persiste a janela em Parquet entre reinícios
+    df = fetch_state_data(state=GOIAS_STATE_CODE, disease=disease, days=days)
+    
+    if df.empty:
+        raise LookupError("resposta sem registros")
+    
+    # Manter apenas municípios de Goiás (prefixo IBGE 52)
+    return filter_state(process_dengue_data(df), GOIAS_UF_IBGE)
+
+
+def fetch_all_municipalities_data(disease: str = "dengue", days: int = 365):
     """
-    Busca dados de todos os municípios.
+    Busca dados de todos os municípios de Goiás em uma única consulta.
+    
+    Usa a consulta estadual de fetch_data (uf=GO, paginação em paralelo)
+    seguida de process_dengue_data e do filtro por UF.
     
     Args:
         disease: Tipo de doença
+        days: Janela de dias até hoje
     
     Returns:
-        DataFrame consolidado
+        DataFrame consolidado (vazio em caso de falha)
     """
     
-    all_data = []
-    
-    for geocode, municipality_name in GOIAS_MUNICIPALITIES.items():
-        df = fetch_infodengue_data(str(geocode), disease)
-        if not df.empty:
-            df['municipio_nome'] = municipality_name
-            df['municipio_geocodigo'] = geocode
-            all_data.append(df)
+    try:
+        return _load_all_municipalities_data(disease, days)
     
-    if not all_data:
+    except Exception as e:
+        logger.error(f"Erro ao buscar dados do estado: {e}")
         return pd.DataFrame()
+
+
+def fetch_latest_week_data(disease: str = "dengue"):
+    """
+    Busca apenas as semanas mais recentes de todos os municípios.
+    
+    Métricas, alertas e tabela só usam o último registro de cada município;
+    uma janela de 28 dias reduz o payload em relação às 52 semanas da série
+    e ainda cobre atrasos de publicação de uma ou duas semanas.
     
-    return pd.concat(all_data, ignore_index=True)
+    Args:
+        disease: Tipo de doença
+    
+    Returns:
+        DataFrame com as últimas semanas epidemiológicas
+    """
+    
+    return fetch_all_municipalities_data(disease=disease, days=28)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def compute_latest(df: pd.DataFrame):
+    """
+    Seleciona o registro mais recente de cada município.
+    
+    Usa groupby + idxmax (O(N)) em vez de ordenar o DataFrame inteiro;
+    o resultado é compartilhado por métricas, gráfico de alertas e tabela.
+    
+    Args:
+        df: DataFrame com a série histórica de todos os municípios
+    
+    Returns:
+        DataFrame com uma linha por município
+    """
+    
+    cols = frozenset(df.columns)
+    date_col = 'data_iniSE' if 'data_iniSE' in cols else 'data_ini_SE'
+    geocode_col = 'municipio_geocodigo' if 'municipio_geocodigo' in cols else 'geocode'
+    
+    if geocode_col not in cols:
+        return df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'])))
+    
+    df = df.dropna(subset=[date_col]).reset_index(drop=True)
+    
+    return df.loc[df.groupby(geocode_col)[date_col].idxmax()]
+
+
+def summarize_latest(df_latest: pd.DataFrame) -> dict:
+    """
+    Reduz o registro mais recente de cada município às métricas estaduais.
+    
+    Trabalha direto sobre os arrays NumPy das colunas: histograma de níveis
+    via bincount e somas/média ignorando NaN, sem DataFrames intermediários.
+    
+    Args:
+        df_latest: DataFrame com uma linha por município
+    
+    Returns:
+        Dicionário com nivel_hist (contagem por nível 0-4), casos, casos_est e rt
+    """
+    
+    cols = frozenset(df_latest.columns)
+    n = len(df_latest)
+    
+    if 'nivel' in cols:
+        nivel = level_indices(df_latest['nivel'])
+    else:
+        nivel = np.zeros(n, dtype=np.int64)
+    
+    def _column(col):
+        if col not in cols:
+            return np.zeros(0)
+        return df_latest[col].to_numpy(dtype='float64', na_value=np.nan)
+    
+    rt = _column('Rt')
+    
+    return {
+        'nivel_hist': np.bincount(nivel, minlength=5),
+        'casos': np.nansum(_column('casos')),
+        'casos_est': np.nansum(_column('casos_est')),
+        'rt': np.nanmean(rt) if np.isfinite(rt).any() else 0,
+    }
+
 
 # ============================================================================
 # FUNÇÕES DE VISUALIZAÇÃO
@@ -148,10 +344,12 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
         return None
     
     try:
+        cols = frozenset(df.columns)
+        
         # Identificar coluna de data
         date_col = None
         for col in ['data_iniSE', 'data_ini_SE', 'data']:
-            if col in df.columns:
+            if col in cols:
                 date_col = col
                 break
         
@@ -160,30 +358,49 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
         
         # Preparar dados
         agg_dict = {}
-        if 'casos_est' in df.columns:
+        if 'casos_est' in cols:
             agg_dict['casos_est'] = 'sum'
-        if 'casos' in df.columns:
+        if 'casos' in cols:
             agg_dict['casos'] = 'sum'
         
         if not agg_dict:
             return None
         
-        df_agg = df.groupby(date_col).agg(agg_dict).reset_index()
+        y_cols = list(agg_dict)
         
-        # Criar gráfico
-        y_cols = [col for col in ['casos_est', 'casos'] if col in df_agg.columns]
+        # Soma direta por data, sem ordenar grupos; ordena só o resultado agregado
+        df_agg = (
+            df.groupby(date_col, sort=False, observed=True)[y_cols]
+            .sum()
+            .reset_index()
+            .sort_values(date_col)
+        )
+        
+        # Remover apenas as semanas zeradas iniciais; zeros recentes são informação
+        nonzero = (df_agg[y_cols] > 0).any(axis=1).to_numpy()
+        if nonzero.any():
+            df_agg = df_agg.iloc[nonzero.argmax():]
+        
+        # Criar gráfico (WebGL); arrays NumPy evitam a normalização de Series do Plotly
+        x = df_agg[date_col].to_numpy()
         
-        fig = px.line(
-            df_agg,
-            x=date_col,
-            y=y_cols,
+        fig = go.Figure()
+        for y_col in y_cols:
+            fig.add_trace(go.Scattergl(
+                x=x,
+                y=df_agg[y_col].to_numpy(),
+                mode='lines+markers',
+                name=RENAME_MAP[y_col]
+            ))
+        
+        fig.update_layout(
             title=title,
-            labels={'casos_est': 'Casos Estimados', 'casos': 'Casos Notificados'},
-            markers=True
+            xaxis_title=RENAME_MAP.get(date_col, date_col),
+            yaxis_title="Casos",
+            height=400,
+            hovermode='x unified'
         )
         
-        fig.update_layout(height=400, hovermode='x unified')
-        
         return fig
     
     except Exception as e:
@@ -191,29 +408,50 @@ def create_time_series_chart(df: pd.DataFrame, title: str = "Evolução de Casos
         return None
 
 
-def create_alert_distribution(df: pd.DataFrame):
-    """Cria gráfico de distribuição de alertas."""
+@st.cache_data(ttl=CACHE_TTL, max_entries=16, show_spinner=False)
+def build_time_series_fig(data_key: tuple, title: str, _df: pd.DataFrame):
+    """
+    Memoiza a série temporal já serializada (fig.to_dict()).
+    
+    Usa o mesmo cache dos dados (TTL e botão de atualização), para que a
+    figura nunca fique mais antiga que as métricas e a tabela.
+    
+    Args:
+        data_key: Chave barata dos dados (escopo, doença, nº de linhas, última data)
+        title: Título do gráfico
+        _df: DataFrame com dados (fora do hash do cache)
+    
+    Returns:
+        Dicionário da figura Plotly ou None
+    """
+    
+    fig = create_time_series_chart(_df, title=title)
+    return fig.to_dict() if fig else None
+
+
+def _series_key(df: pd.DataFrame, scope, disease: str) -> tuple:
+    """Chave de cache da série: (escopo, doença, nº de linhas, última data)."""
     
-    if df.empty or 'nivel' not in df.columns:
+    cols = frozenset(df.columns)
+    date_col = 'data_iniSE' if 'data_iniSE' in cols else 'data_ini_SE'
+    last_date = df[date_col].max() if date_col in cols and len(df) else None
+    return (scope, disease, len(df), last_date)
+
+
+def create_alert_distribution(nivel_counts: pd.Series):
+    """Cria gráfico de distribuição de alertas a partir da contagem de municípios por nível."""
+    
+    if nivel_counts.empty:
         return None
     
     try:
-        # Usar registro mais recente por município
-        date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
-        geocode_col = 'municipio_geocodigo' if 'municipio_geocodigo' in df.columns else 'geocode'
-        
-        if geocode_col in df.columns:
-            df_latest = df.sort_values(date_col).groupby(geocode_col).tail(1)
-        else:
-            df_latest = df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'])))
-        
-        nivel_counts = df_latest['nivel'].value_counts().sort_index()
+        nivel_counts = nivel_counts.sort_index()
         
-        nivel_names = {1: "Verde", 2: "Amarelo", 3: "Laranja", 4: "Vermelho"}
-        nivel_colors = {1: "#2ecc71", 2: "#f39c12", 3: "#e67e22", 4: "#e74c3c"}
+        # Níveis fora de 1-4 caem no índice 0 (desconhecido)
+        idx = level_indices(nivel_counts.index)
         
-        labels = [nivel_names.get(i, f"Nível {i}") for i in nivel_counts.index]
-        colors = [nivel_colors.get(i, "#95a5a6") for i in nivel_counts.index]
+        labels = NIVEL_NAMES[idx]
+        colors = NIVEL_COLORS[idx]
         
         fig = go.Figure(data=[
             go.Bar(
@@ -240,37 +478,24 @@ def create_alert_distribution(df: pd.DataFrame):
         return None
 
 
-def create_municipalities_table(df: pd.DataFrame):
-    """Cria tabela com dados de municípios."""
+def create_municipalities_table(df_latest: pd.DataFrame):
+    """Cria tabela com o registro mais recente de cada município."""
     
-    if df.empty:
+    if df_latest.empty:
         return None
     
     try:
-        date_col = 'data_iniSE' if 'data_iniSE' in df.columns else 'data_ini_SE'
-        geocode_col = 'municipio_geocodigo' if 'municipio_geocodigo' in df.columns else 'geocode'
-        
-        if geocode_col in df.columns:
-            df_latest = df.sort_values(date_col).groupby(geocode_col).tail(1)
-        else:
-            df_latest = df.sort_values(date_col).tail(len(df.drop_duplicates(subset=['municipio_nome'])))
+        cols = frozenset(df_latest.columns)
         
         # Selecionar colunas para exibição
         cols_to_show = [
             'municipio_nome', 'casos_est', 'casos', 'p_inc100k', 'Rt', 'nivel'
         ]
         
-        df_display = df_latest[[col for col in cols_to_show if col in df_latest.columns]].copy()
-        
-        # Renomear colunas
-        df_display.columns = [
-            'Município',
-            'Casos Estimados',
-            'Casos Notificados',
-            'Taxa de Incidência',
-            'Rt',
-            'Nível'
-        ]
+        # Seleção e renomeação sem cópia intermediária
+        df_display = df_latest.loc[
+            :, [col for col in cols_to_show if col in cols]
+        ].rename(columns=RENAME_MAP)
         
         return df_display
     
@@ -278,6 +503,231 @@ def create_municipalities_table(df: pd.DataFrame):
         logger.error(f"Erro ao criar tabela: {e}")
         return None
 
+# ============================================================================
+# RENDERIZAÇÃO DAS VISUALIZAÇÕES
+# ============================================================================
+
+@st.fragment
+def render_state(disease: str):
+    """
+    Renderiza a visão estadual como fragmento independente.
+    
+    Args:
+        disease: Tipo de doença
+    """
+    # Semanas recentes: suficiente para métricas, alertas e tabela
+    df_recent = fetch_latest_week_data(disease=disease)
+    df_state = None
+    
+    if df_recent.empty:
+        # Janela curta vazia (publicação atrasada ou falha): usar a série completa
+        df_state = fetch_all_municipalities_data(disease=disease)
+        df_recent = df_state
+    
+    if df_recent.empty:
+        st.error("❌ Não foi possível carregar os dados. Verifique a conexão com a API.")
+        return
+    
+    st.markdown("## 📊 Visão Geral do Estado")
+    
+    # Registro mais recente por município (reutilizado abaixo)
+    df_latest = compute_latest(df_recent)
+    
+    # Histograma de níveis e métricas principais em uma única redução
+    summary = summarize_latest(df_latest)
+    nivel_hist = summary['nivel_hist']
+    nivel_counts = pd.Series(nivel_hist)[nivel_hist > 0]
+    
+    verde, amarelo, laranja, vermelho = (int(nivel_hist[i]) for i in (1, 2, 3, 4))
+    
+    # Métricas principais
+    total_casos_est = summary['casos_est']
+    total_casos = summary['casos']
+    media_rt = summary['rt']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            label="📈 Casos Estimados",
+            value=f"{total_casos_est:,.0f}"
+        )
+    
+    with col2:
+        st.metric(
+            label="📋 Casos Notificados",
+            value=f"{total_casos:,.0f}"
+        )
+    
+    with col3:
+        st.metric(
+            label="🔴 Rt Médio",
+            value=f"{media_rt:.2f}",
+            delta="Epidemia em crescimento" if media_rt > 1 else "Epidemia em controle"
+        )
+    
+    with col4:
+        st.metric(
+            label="🚨 Municípios em Alerta Vermelho",
+            value=vermelho
+        )
+    
+    # Distribuição de níveis de alerta
+    st.markdown("### Distribuição de Níveis de Alerta")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        fig_alert = create_alert_distribution(nivel_counts)
+        if fig_alert:
+            st.plotly_chart(fig_alert, use_container_width=True)
+    
+    with col2:
+        st.markdown("#### Resumo por Nível")
+        st.markdown(f"""
+        - 🟢 **Verde**: {verde} municípios
+        - 🟡 **Amarelo**: {amarelo} municípios
+        - 🟠 **Laranja**: {laranja} municípios
+        - 🔴 **Vermelho**: {vermelho} municípios
+        """)
+    
+    # Série temporal: espaço reservado, preenchido após a tabela
+    st.markdown("### Evolução Temporal de Casos")
+    
+    ts_container = st.container()
+    
+    # Tabela de municípios
+    st.markdown("### 📋 Dados por Município")
+    
+    df_table = create_municipalities_table(df_latest)
+    if df_table is not None:
+        st.dataframe(df_table, use_container_width=True)
+    
+    # Série completa (52 semanas) só depois que o restante da página foi exibido
+    with ts_container:
+        if df_state is None:
+            df_state = fetch_all_municipalities_data(disease=disease)
+        
+        fig_ts = build_time_series_fig(
+            _series_key(df_state, "estado", disease), "Evolução de Casos", df_state
+        )
+        if fig_ts:
+            st.plotly_chart(fig_ts, use_container_width=True)
+
+
+@st.fragment
+def render_municipality(disease: str):
+    """
+    Renderiza a análise por município como fragmento independente.
+    
+    Trocar o município selecionado reexecuta apenas este fragmento,
+    sem refazer a visão estadual nem o restante da página.
+    
+    Args:
+        disease: Tipo de doença
+    """
+    st.markdown("## 🏘️ Análise por Município")
+    
+    # Seletor de município
+    selected_municipality = st.selectbox(
+        "Selecione um município:",
+        options=_MUNI_OPTIONS
+    )
+    
+    geocode = _INV_MUNI[selected_municipality]
+    
+    # Buscar dados do município
+    df_muni = fetch_infodengue_data(str(geocode), disease=disease)
+    
+    if df_muni.empty:
+        st.warning(f"⚠️ Não há dados disponíveis para {selected_municipality}")
+    else:
+        cols = frozenset(df_muni.columns)
+        
+        # Métricas do município
+        date_col = 'data_iniSE' if 'data_iniSE' in cols else 'data_ini_SE'
+        latest = df_muni.loc[df_muni[date_col].idxmax()] if not df_muni.empty else {}
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            casos_est = latest.get('casos_est', 0)
+            st.metric(label="Casos Estimados", value=f"{casos_est:.0f}")
+        
+        with col2:
+            casos = latest.get('casos', 0)
+            st.metric(label="Casos Notificados", value=f"{casos:.0f}")
+        
+        with col3:
+            rt = latest.get('Rt', 0)
+            st.metric(label="Rt", value=f"{rt:.2f}")
+        
+        with col4:
+            nivel = latest.get('nivel', 1)
+            nivel_name = get_alert_level_name(nivel)
+            nivel_color = get_alert_level_color(nivel)
+            
+            st.markdown(f"""
+            <div style="background-color: {nivel_color}; padding: 20px; border-radius: 10px; text-align: center;">
+                <h3 style="color: white; margin: 0;">Nível: {nivel_name}</h3>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        # Série temporal do município
+        st.markdown("### Evolução de Casos")
+        
+        fig_ts_muni = build_time_series_fig(
+            _series_key(df_muni, geocode, disease),
+            f"Evolução de Casos - {selected_municipality}",
+            df_muni
+        )
+        if fig_ts_muni:
+            st.plotly_chart(fig_ts_muni, use_container_width=True)
+        
+        # Dados detalhados
+        st.markdown("### Dados Detalhados")
+        
+        cols_to_show = [
+            'data_iniSE', 'data_ini_SE', 'casos_est', 'casos', 'p_inc100k', 'Rt', 'nivel'
+        ]
+        
+        df_display = df_muni.loc[
+            :, [col for col in cols_to_show if col in cols]
+        ].rename(columns=RENAME_MAP)
+        
+        st.dataframe(df_display, use_container_width=True)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _tech_info_md() -> str:
+    """
+    Monta o texto de informações técnicas uma única vez.
+    
+    Fica em cache junto com os dados (mesmo TTL e limpo pelo botão de
+    atualização), então o horário exibido acompanha a última carga.
+    """
+    
+    return f"""
+    ### Fontes de Dados
+    
+    - **API InfoDengue**: Dados epidemiológicos em tempo real
+    - **IBGE**: Dados geográficos e populacionais
+    
+    ### Variáveis Principais
+    
+    | Variável | Descrição |
+    |----------|-----------|
+    | **Casos Estimados** | Estimativas via modelo de nowcasting |
+    | **Casos Notificados** | Casos confirmados em laboratório |
+    | **Rt** | Número Reprodutivo Efetivo |
+    | **Incidência** | Casos por 100.000 habitantes |
+    | **Nível de Alerta** | 1=Verde, 2=Amarelo, 3=Laranja, 4=Vermelho |
+    
+    ### Atualização
+    
+    Os dados são atualizados semanalmente. Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M')}
+    """
+
 # ============================================================================
 # INTERFACE PRINCIPAL
 # ============================================================================
@@ -307,179 +757,27 @@ def main():
         index=0
     )
     
-    # Buscar dados
-    st.sidebar.info("⏳ Carregando dados...")
-    
-    df_state = fetch_all_municipalities_data(disease=disease)
+    if st.sidebar.button("🔄 Atualizar dados"):
+        st.cache_data.clear()
+        clear_persisted_data()
+        with _inflight_lock:
+            _response_cache.clear()
     
-    if df_state.empty:
-        st.error("❌ Não foi possível carregar os dados. Verifique a conexão com a API.")
-        return
+    st.sidebar.info("⏳ Carregando dados...")
     
     # ========================================================================
     # VISUALIZAÇÃO ESTADUAL
     # ========================================================================
     
     if view_type == "Estadual":
-        st.markdown("## 📊 Visão Geral do Estado")
-        
-        # Identificar colunas
-        date_col = 'data_iniSE' if 'data_iniSE' in df_state.columns else 'data_ini_SE'
-        geocode_col = 'municipio_geocodigo' if 'municipio_geocodigo' in df_state.columns else 'geocode'
-        
-        # Métricas principais
-        if geocode_col in df_state.columns:
-            df_latest = df_state.sort_values(date_col).groupby(geocode_col).tail(1)
-        else:
-            df_latest = df_state.sort_values(date_col).tail(len(df_state.drop_duplicates(subset=['municipio_nome'])))
-        
-        total_casos_est = df_latest['casos_est'].sum() if 'casos_est' in df_latest.columns else 0
-        total_casos = df_latest['casos'].sum() if 'casos' in df_latest.columns else 0
-        media_rt = df_latest['Rt'].mean() if 'Rt' in df_latest.columns else 0
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric(
-                label="📈 Casos Estimados",
-                value=f"{total_casos_est:,.0f}"
-            )
-        
-        with col2:
-            st.metric(
-                label="📋 Casos Notificados",
-                value=f"{total_casos:,.0f}"
-            )
-        
-        with col3:
-            st.metric(
-                label="🔴 Rt Médio",
-                value=f"{media_rt:.2f}",
-                delta="Epidemia em crescimento" if media_rt > 1 else "Epidemia em controle"
-            )
-        
-        with col4:
-            if 'nivel' in df_latest.columns:
-                vermelho = (df_latest['nivel'] == 4).sum()
-            else:
-                vermelho = 0
-            st.metric(
-                label="🚨 Municípios em Alerta Vermelho",
-                value=vermelho
-            )
-        
-        # Distribuição de níveis de alerta
-        st.markdown("### Distribuição de Níveis de Alerta")
-        
-        col1, col2 = st.columns([2, 1])
-        
-        with col1:
-            fig_alert = create_alert_distribution(df_state)
-            if fig_alert:
-                st.plotly_chart(fig_alert, use_container_width=True)
-        
-        with col2:
-            if 'nivel' in df_latest.columns:
-                verde = (df_latest['nivel'] == 1).sum()
-                amarelo = (df_latest['nivel'] == 2).sum()
-                laranja = (df_latest['nivel'] == 3).sum()
-                vermelho = (df_latest['nivel'] == 4).sum()
-            else:
-                verde = amarelo = laranja = vermelho = 0
-            
-            st.markdown("#### Resumo por Nível")
-            st.markdown(f"""
-            - 🟢 **Verde**: {verde} municípios
-            - 🟡 **Amarelo**: {amarelo} municípios
-            - 🟠 **Laranja**: {laranja} municípios
-            - 🔴 **Vermelho**: {vermelho} municípios
-            """)
-        
-        # Série temporal
-        st.markdown("### Evolução Temporal de Casos")
-        
-        fig_ts = create_time_series_chart(df_state)
-        if fig_ts:
-            st.plotly_chart(fig_ts, use_container_width=True)
-        
-        # Tabela de municípios
-        st.markdown("### 📋 Dados por Município")
-        
-        df_table = create_municipalities_table(df_state)
-        if df_table is not None:
-            st.dataframe(df_table, use_container_width=True)
+        render_state(disease)
     
     # ========================================================================
     # VISUALIZAÇÃO POR MUNICÍPIO
     # ========================================================================
     
     else:
-        st.markdown("## 🏘️ Análise por Município")
-        
-        # Seletor de município
-        municipality_options = {v: k for k, v in GOIAS_MUNICIPALITIES.items()}
-        selected_municipality = st.selectbox(
-            "Selecione um município:",
-            options=sorted(list(municipality_options.keys()))
-        )
-        
-        geocode = municipality_options[selected_municipality]
-        
-        # Buscar dados do município
-        df_muni = fetch_infodengue_data(str(geocode), disease=disease)
-        
-        if df_muni.empty:
-            st.warning(f"⚠️ Não há dados disponíveis para {selected_municipality}")
-        else:
-            # Métricas do município
-            date_col = 'data_iniSE' if 'data_iniSE' in df_muni.columns else 'data_ini_SE'
-            latest = df_muni.sort_values(date_col).iloc[-1] if not df_muni.empty else {}
-            
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                casos_est = latest.get('casos_est', 0)
-                st.metric(label="Casos Estimados", value=f"{casos_est:.0f}")
-            
-            with col2:
-                casos = latest.get('casos', 0)
-                st.metric(label="Casos Notificados", value=f"{casos:.0f}")
-            
-            with col3:
-                rt = latest.get('Rt', 0)
-                st.metric(label="Rt", value=f"{rt:.2f}")
-            
-            with col4:
-                nivel = int(latest.get('nivel', 1))
-                nivel_names = {1: "Verde", 2: "Amarelo", 3: "Laranja", 4: "Vermelho"}
-                nivel_colors = {1: "#2ecc71", 2: "#f39c12", 3: "#e67e22", 4: "#e74c3c"}
-                
-                nivel_name = nivel_names.get(nivel, "Desconhecido")
-                nivel_color = nivel_colors.get(nivel, "#95a5a6")
-                
-                st.markdown(f"""
-                <div style="background-color: {nivel_color}; padding: 20px; border-radius: 10px; text-align: center;">
-                    <h3 style="color: white; margin: 0;">Nível: {nivel_name}</h3>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Série temporal do município
-            st.markdown("### Evolução de Casos")
-            
-            fig_ts_muni = create_time_series_chart(df_muni, title=f"Evolução de Casos - {selected_municipality}")
-            if fig_ts_muni:
-                st.plotly_chart(fig_ts_muni, use_container_width=True)
-            
-            # Dados detalhados
-            st.markdown("### Dados Detalhados")
-            
-            cols_to_show = [
-                'data_iniSE', 'data_ini_SE', 'casos_est', 'casos', 'p_inc100k', 'Rt', 'nivel'
-            ]
-            
-            df_display = df_muni[[col for col in cols_to_show if col in df_muni.columns]].copy()
-            
-            st.dataframe(df_display, use_container_width=True)
+        render_municipality(disease)
     
     # ========================================================================
     # INFORMAÇÕES TÉCNICAS
@@ -488,26 +786,7 @@ def main():
     st.markdown("---")
     
     with st.expander("ℹ️ Informações Técnicas"):
-        st.markdown("""
-        ### Fontes de Dados
-        
-        - **API InfoDengue**: Dados epidemiológicos em tempo real
-        - **IBGE**: Dados geográficos e populacionais
-        
-        ### Variáveis Principais
-        
-        | Variável | Descrição |
-        |----------|-----------|
-        | **Casos Estimados** | Estimativas via modelo de nowcasting |
-        | **Casos Notificados** | Casos confirmados em laboratório |
-        | **Rt** | Número Reprodutivo Efetivo |
-        | **Incidência** | Casos por 100.000 habitantes |
-        | **Nível de Alerta** | 1=Verde, 2=Amarelo, 3=Laranja, 4=Vermelho |
-        
-        ### Atualização
-        
-        Os dados são atualizados semanalmente. Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M')}
-        """)
+        st.markdown(_tech_info_md())
 
 if __name__ == "__main__":
     main()
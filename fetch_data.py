@@ -5,9 +5,20 @@ e preparar para visualização no dashboard Streamlit
 
 import requests
 import pandas as pd
-import json
+import numpy as np
+import streamlit as st
+import orjson
+import ijson
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Final
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,8 +27,66 @@ logger = logging.getLogger(__name__)
 MOSQLIMATE_API = "https://api.mosqlimate.org/api/datastore/infodengue"
 INFODENGUE_API = "https://info.dengue.mat.br/api/alertcity"
 
+# Campos da API Mosqlimate usados no processamento e no dashboard, com o
+# tipo do array em que cada coluna é acumulada (inteiros ausentes ficam 0,
+# floats ausentes ficam NaN, textos ausentes ficam None)
+SCHEMA = {
+    'data_iniSE': object,
+    'SE': np.int32,
+    'municipio_geocodigo': np.int32,
+    'municipio_nome': object,
+    'casos_est': np.float32,
+    'casos_est_min': np.float32,
+    'casos_est_max': np.float32,
+    'casos': np.uint32,
+    'p_rt1': np.float32,
+    'p_inc100k': np.float32,
+    'Rt': np.float32,
+    'nivel': np.uint8,
+    'pop': np.uint32,
+    'receptivo': np.float32,
+    'transmissao': np.float32,
+    'umidmax': np.float32,
+    'umidmed': np.float32,
+    'umidmin': np.float32,
+    'tempmax': np.float32,
+    'tempmed': np.float32,
+    'tempmin': np.float32,
+}
+
+# Registros por página na API Mosqlimate
+PER_PAGE = 100
+
+# Páginas buscadas simultaneamente
+MAX_WORKERS = 8
+
+# Sessão HTTP compartilhada (também pelos dashboards): keep-alive, pool de
+# conexões e retentativas. O Accept-Encoding padrão do requests já negocia
+# gzip (e br com brotli).
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "dengue-dashboard/1.0"})
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Os dados da API são atualizados semanalmente
+CACHE_TTL = 7 * 24 * 3600
+
+# Diretório das consultas persistidas em Parquet (uma por semana ISO)
+DATA_DIR = Path("data")
+
+# Janela padrão da consulta estadual (últimas 52 semanas)
+DEFAULT_WINDOW_DAYS = 365
+
+# Nomes e cores dos níveis de alerta, indexados pelo nível (0 = desconhecido)
+NIVEL_NAMES: Final = ("Desconhecido", "Verde", "Amarelo", "Laranja", "Vermelho")
+NIVEL_COLORS: Final = ("#95a5a6", "#2ecc71", "#f39c12", "#e67e22", "#e74c3c")
+
 # Estados e municípios de interesse (Goiás como foco principal)
 GOIAS_STATE_CODE = "GO"
+GOIAS_UF_IBGE = 52  # prefixo IBGE dos geocódigos municipais de Goiás
 GOIAS_MUNICIPALITIES = {
     "3301500": "Goiânia",
     "3302502": "Aparecida de Goiânia",
@@ -28,29 +97,153 @@ GOIAS_MUNICIPALITIES = {
 }
 
 
-def fetch_infodengue_data(
-    state: str = "GO",
-    start_date: str = None,
-    end_date: str = None,
-    disease: str = "dengue"
-) -> pd.DataFrame:
+def _alloc_columns(n_rows: int) -> dict:
     """
-    Busca dados da API Mosqlimate para um estado específico.
+    Pré-aloca um array por coluna de SCHEMA.
     
     Args:
-        state: Código do estado (UF) - ex: "GO", "SP"
-        start_date: Data inicial (YYYY-mm-dd)
-        end_date: Data final (YYYY-mm-dd)
-        disease: Tipo de doença (dengue, zika, chikungunya)
+        n_rows: Número de linhas a reservar
     
     Returns:
-        DataFrame com dados epidemiológicos
+        Dicionário coluna -> array NumPy
+    """
+    
+    columns = {}
+    for col, dtype in SCHEMA.items():
+        if dtype is object:
+            columns[col] = np.full(n_rows, None, dtype=object)
+        elif np.issubdtype(dtype, np.floating):
+            columns[col] = np.full(n_rows, np.nan, dtype=dtype)
+        else:
+            columns[col] = np.zeros(n_rows, dtype=dtype)
+    
+    return columns
+
+
+def _fill_rows(columns: dict, items, offset: int) -> int:
+    """
+    Copia registros da API para os arrays a partir de uma posição.
+    
+    Escreve no máximo PER_PAGE registros, para não invadir a faixa de
+    linhas de outra página.
+    
+    Args:
+        columns: Arrays pré-alocados (ver _alloc_columns)
+        items: Iterável de registros (dicts)
+        offset: Primeira linha a preencher
+    
+    Returns:
+        Número de registros copiados
+    """
+    
+    end = min(offset + PER_PAGE, len(columns['SE']))
+    count = 0
+    
+    for item in items:
+        row = offset + count
+        if row >= end:
+            logger.warning(f"Página com mais de {PER_PAGE} registros; excedentes ignorados")
+            break
+        for col, values in columns.items():
+            value = item.get(col)
+            if value is not None:
+                try:
+                    values[row] = value
+                except (TypeError, ValueError, OverflowError):
+                    # Valor fora do tipo da coluna: mantém o valor de ausência
+                    pass
+        count += 1
+    
+    return count
+
+
+def _stream_page(params: dict, columns: dict) -> tuple:
+    """
+    Busca uma página da API Mosqlimate gravando os registros direto nos arrays.
+    
+    O corpo da resposta é decodificado em streaming; cada página ocupa as
+    linhas a partir de (página - 1) * PER_PAGE.
+    
+    Args:
+        params: Parâmetros da consulta (inclui a página)
+        columns: Arrays pré-alocados compartilhados entre as páginas
+    
+    Returns:
+        Tupla (linha inicial, número de registros copiados)
+    """
+    
+    offset = (params["page"] - 1) * PER_PAGE
+    
+    with SESSION.get(MOSQLIMATE_API, params=params, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        
+        count = _fill_rows(columns, ijson.items(response.raw, 'items.item', use_float=True), offset)
+    
+    return offset, count
+
+
+def clear_persisted_data() -> None:
+    """
+    Remove as consultas persistidas em DATA_DIR.
+    
+    Usado na atualização forçada: sem isso, o Parquet da semana ISO
+    continuaria sendo servido depois de limpar o cache do Streamlit.
     """
     
+    for path in DATA_DIR.glob("*.parquet"):
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.warning(f"Não foi possível remover {path}: {e}")
+
+
+def _save_parquet(df: pd.DataFrame, path: Path) -> None:
+    """
+    Grava o DataFrame em Parquet de forma atômica (arquivo temporário + rename).
+    
+    Args:
+        df: DataFrame a persistir
+        path: Caminho final do arquivo
+    """
+    
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Não foi possível salvar {path}: {e}")
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def _load_infodengue_data(
+    state: str,
+    start_date,
+    end_date,
+    disease: str,
+    days: int
+) -> pd.DataFrame:
+    """
+    Consulta cacheada de fetch_infodengue_data.
+    
+    Falhas e respostas vazias levantam exceção para não ficarem no cache.
+    """
+    
+    cache_path = None
+    
+    if start_date is None and end_date is None:
+        year, week, _ = datetime.now().isocalendar()
+        cache_path = DATA_DIR / f"{disease}_{state}_{days}d_{year}W{week:02d}.parquet"
+        
+        if cache_path.exists() and time.time() - cache_path.stat().st_mtime < CACHE_TTL:
+            logger.info(f"Usando dados persistidos em {cache_path}")
+            return pd.read_parquet(cache_path, engine='pyarrow')
+    
     if start_date is None:
-        # Últimos 52 semanas
+        # Últimos `days` dias (52 semanas por padrão)
         end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=365)
+        start_date = end_date - timedelta(days=days)
     
     if end_date is None:
         end_date = datetime.now().date()
@@ -63,49 +256,136 @@ def fetch_infodengue_data(
     
     params = {
         "page": 1,
-        "per_page": 100,
+        "per_page": PER_PAGE,
         "disease": disease,
         "start": start_date,
         "end": end_date,
         "uf": state
     }
     
-    try:
-        response = requests.get(MOSQLIMATE_API, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Extrair items da resposta
-        items = data.get("items", [])
-        
-        # Se houver múltiplas páginas, buscar todas
-        pagination = data.get("pagination", {})
-        total_pages = pagination.get("total_pages", 1)
-        
-        logger.info(f"Total de páginas: {total_pages}")
-        
-        all_items = items.copy()
-        
-        for page in range(2, total_pages + 1):
-            params["page"] = page
-            response = requests.get(MOSQLIMATE_API, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            all_items.extend(data.get("items", []))
-        
-        # Converter para DataFrame
-        df = pd.DataFrame(all_items)
-        
-        logger.info(f"Dados obtidos: {len(df)} registros")
-        
-        return df
+    response = SESSION.get(MOSQLIMATE_API, params=params, timeout=30)
+    response.raise_for_status()
+    
+    data = orjson.loads(response.content)
+    
+    # Extrair items da resposta
+    items = data.get("items", [])
+    
+    # Se houver múltiplas páginas, buscar todas
+    pagination = data.get("pagination", {})
+    total_pages = pagination.get("total_pages", 1)
+    
+    logger.info(f"Total de páginas: {total_pages}")
+    
+    # Um array por coluna, dimensionado para todas as páginas
+    columns = _alloc_columns(total_pages * PER_PAGE)
+    filled = [(0, _fill_rows(columns, items, 0))]
+    
+    # Demais páginas em paralelo (I/O-bound), cada uma em sua faixa de linhas
+    params_list = [{**params, "page": page} for page in range(2, total_pages + 1)]
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        filled.extend(executor.map(lambda p: _stream_page(p, columns), params_list))
+    
+    # Descartar as linhas não preenchidas (página final incompleta)
+    keep = np.zeros(total_pages * PER_PAGE, dtype=bool)
+    for offset, count in filled:
+        keep[offset:offset + count] = True
     
-    except requests.exceptions.RequestException as e:
+    if keep.all():
+        df = pd.DataFrame(columns, copy=False)
+    else:
+        df = pd.DataFrame({col: values[keep] for col, values in columns.items()}, copy=False)
+    
+    logger.info(f"Dados obtidos: {len(df)} registros")
+    
+    if df.empty:
+        raise LookupError("resposta sem registros")
+    
+    if cache_path is not None:
+        _save_parquet(df, cache_path)
+    
+    return df
+
+
+def fetch_infodengue_data(
+    state: str = "GO",
+    start_date: str = None,
+    end_date: str = None,
+    disease: str = "dengue",
+    days: int = DEFAULT_WINDOW_DAYS
+) -> pd.DataFrame:
+    """
+    Busca dados da API Mosqlimate para um estado específico.
+    
+    Sem datas explícitas (últimos `days` dias até hoje), o resultado é
+    persistido em DATA_DIR como Parquet por janela e semana ISO e reutilizado
+    entre sessões e reinícios enquanto tiver menos de uma semana.
+    
+    Args:
+        state: Código do estado (UF) - ex: "GO", "SP"
+        start_date: Data inicial (YYYY-mm-dd)
+        end_date: Data final (YYYY-mm-dd)
+        disease: Tipo de doença (dengue, zika, chikungunya)
+        days: Janela em dias quando start_date não é informado
+    
+    Returns:
+        DataFrame com dados epidemiológicos
+    """
+    
+    try:
+        return _load_infodengue_data(state, start_date, end_date, disease, days)
+    
+    except (
+        requests.exceptions.RequestException,
+        Urllib3HTTPError,  # queda de conexão/timeout durante a leitura em streaming
+        orjson.JSONDecodeError,
+        ijson.JSONError,
+        LookupError
+    ) as e:
         logger.error(f"Erro ao buscar dados: {e}")
         return pd.DataFrame()
 
 
+@st.cache_data(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def _load_infodengue_city_data(
+    geocode: str,
+    disease: str,
+    ew_start: int,
+    ew_end: int,
+    ey_start: int,
+    ey_end: int
+) -> pd.DataFrame:
+    """
+    Consulta cacheada de fetch_infodengue_city_data.
+    
+    Falhas e respostas vazias levantam exceção para não ficarem no cache.
+    """
+    
+    params = {
+        "geocode": geocode,
+        "disease": disease,
+        "format": "json",
+        "ew_start": ew_start,
+        "ew_end": ew_end,
+        "ey_start": ey_start,
+        "ey_end": ey_end
+    }
+    
+    response = SESSION.get(INFODENGUE_API, params=params, timeout=30)
+    response.raise_for_status()
+    
+    data = orjson.loads(response.content)
+    df = pd.DataFrame.from_records(data)
+    
+    logger.info(f"Dados obtidos para {geocode}: {len(df)} registros")
+    
+    if df.empty:
+        raise LookupError("resposta sem registros")
+    
+    return df
+
+
 def fetch_infodengue_city_data(
     geocode: str,
     disease: str = "dengue",
@@ -131,29 +411,10 @@ def fetch_infodengue_city_data(
     
     logger.info(f"Buscando dados para geocode {geocode}")
     
-    url = INFODENGUE_API
-    params = {
-        "geocode": geocode,
-        "disease": disease,
-        "format": "json",
-        "ew_start": ew_start,
-        "ew_end": ew_end,
-        "ey_start": ey_start,
-        "ey_end": ey_end
-    }
-    
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        df = pd.DataFrame(data)
-        
-        logger.info(f"Dados obtidos para {geocode}: {len(df)} registros")
-        
-        return df
+        return _load_infodengue_city_data(geocode, disease, ew_start, ew_end, ey_start, ey_end)
     
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError, LookupError) as e:
         logger.error(f"Erro ao buscar dados da cidade: {e}")
         return pd.DataFrame()
 
@@ -187,8 +448,25 @@ def process_dengue_data(df: pd.DataFrame) -> pd.DataFrame:
     if 'data_iniSE' in df.columns:
         df['data_iniSE'] = pd.to_datetime(df['data_iniSE'], errors='coerce')
     
-    # Preencher valores faltantes
-    df = df.fillna(0)
+    # Preencher valores faltantes apenas nas colunas numéricas (datas mantêm NaT)
+    num_cols_present = [col for col in numeric_cols if col in df.columns]
+    df[num_cols_present] = df[num_cols_present].fillna(0)
+    
+    # Reduzir tipos numéricos: groupby/sort/value_counts percorrem menos bytes
+    if 'nivel' in df.columns:
+        df['nivel'] = pd.to_numeric(df['nivel'], errors='coerce').fillna(0).astype('int8')
+    
+    for col in ('casos', 'casos_est', 'casos_est_min', 'casos_est_max', 'pop'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='unsigned')
+    
+    for col in ('Rt', 'p_rt1', 'p_inc100k', 'umidmax', 'umidmed', 'umidmin',
+                'tempmax', 'tempmed', 'tempmin', 'receptivo', 'transmissao'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='float')
+    
+    if 'municipio_nome' in df.columns:
+        df['municipio_nome'] = df['municipio_nome'].astype('category')
     
     # Ordenar por data
     if 'data_iniSE' in df.columns:
@@ -197,6 +475,63 @@ def process_dengue_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def filter_state(df: pd.DataFrame, uf_ibge: int = GOIAS_UF_IBGE) -> pd.DataFrame:
+    """
+    Mantém apenas os municípios de uma UF pelo prefixo IBGE do geocódigo.
+    
+    Args:
+        df: DataFrame com a coluna municipio_geocodigo
+        uf_ibge: Código IBGE da UF (dois primeiros dígitos do geocódigo)
+    
+    Returns:
+        DataFrame filtrado
+    """
+    
+    if df.empty or 'municipio_geocodigo' not in df.columns:
+        return df
+    
+    # Sem custo para a coluna int32 de SCHEMA; cobre geocódigos em texto
+    geocodes = pd.to_numeric(df['municipio_geocodigo'], errors='coerce').to_numpy()
+    mask = geocodes // 100000 == uf_ibge
+    
+    return df if mask.all() else df[mask]
+
+
+def level_index(level) -> int:
+    """
+    Converte o nível de alerta em índice de NIVEL_NAMES/NIVEL_COLORS.
+    
+    Args:
+        level: Nível (1-4); aceita int, float integral ou numpy
+    
+    Returns:
+        Índice do nível, ou 0 (desconhecido) se inválido ou fora de 1-4
+    """
+    
+    try:
+        index = int(level)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    
+    return index if index == level and 1 <= index <= 4 else 0
+
+
+def level_indices(levels) -> np.ndarray:
+    """
+    Versão vetorizada de level_index.
+    
+    Args:
+        levels: Sequência de níveis (Series, Index, array ou lista)
+    
+    Returns:
+        Array int64 de índices; inválidos, NaN ou fora de 1-4 viram 0
+    """
+    
+    values = pd.to_numeric(pd.Series(levels), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    
+    return np.where(np.isin(values, (1, 2, 3, 4)), values, 0).astype(np.int64)
+
+
 def get_alert_level_name(level: int) -> str:
     """
     Converte nível de alerta numérico para nome.
@@ -208,14 +543,7 @@ def get_alert_level_name(level: int) -> str:
         Nome do nível
     """
     
-    levels = {
-        1: "Verde",
-        2: "Amarelo",
-        3: "Laranja",
-        4: "Vermelho"
-    }
-    
-    return levels.get(level, "Desconhecido")
+    return NIVEL_NAMES[level_index(level)]
 
 
 def get_alert_level_color(level: int) -> str:
@@ -229,14 +557,7 @@ def get_alert_level_color(level: int) -> str:
         Cor em hex
     """
     
-    colors = {
-        1: "#2ecc71",  # Verde
-        2: "#f39c12",  # Amarelo
-        3: "#e67e22",  # Laranja
-        4: "#e74c3c"   # Vermelho
-    }
-    
-    return colors.get(level, "#95a5a6")
+    return NIVEL_COLORS[level_index(level)]
 
 
 if __name__ == "__main__":
@@ -244,7 +565,7 @@ if __name__ == "__main__":
     df = fetch_infodengue_data(state="GO")
     
     if not df.empty:
-        df = process_dengue_data(df)
+        df = filter_state(process_dengue_data(df))
         print(f"Dados processados: {len(df)} registros")
         print(df.head())
         print("\nColunas disponíveis:")